@@ -48,7 +48,8 @@ class TradeEngine:
         """
         # 1. Get Lighter Taker Prices
         ob = await self.lighter.get_orderbook(self.symbol_lighter)
-        if not ob or not ob.get('asks') or not ob.get('bids'):
+        # Levels are ndarrays (no truth value): test emptiness by length
+        if not ob or len(ob.get('asks', ())) == 0 or len(ob.get('bids', ())) == 0:
             return
 
         best_ask = float(ob['asks'][0][0])
@@ -1,177 +1,243 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
-import aiohttp
-import asyncio
-import threading
-import time
+import plotly.io as pio
+import multiprocessing as mp
 import os
-import csv
-from datetime import datetime, timedelta
+import io
+from dateutil import tz
+import collector
+from collector import DATA_DIR, PRICE_COLS, MAX_LOOKBACK_MINS, read_api_status
+from kernels import spread_corridor, histogram
 
 # ==============================================================================
 # 1. ROBUST SETUP & PATHING
 # ==============================================================================
-DATA_DIR = "data"
-os.makedirs(DATA_DIR, exist_ok=True)
+PRICE_DTYPE = np.float32
+# Chart time zone (the machine's, DST-aware)
+LOCAL_TZ = tz.tzlocal()
 
-# Shared dictionary for UI status (safe for threads)
-API_LOG = {"Lighter": "⏳", "Paradex": "⏳", "Bybit": "⏳", "Binance": "⏳"}
+# Histogram resolution for the distribution plots
+NBINS = 60
+# Line charts are downsampled to roughly one point per horizontal pixel
+PLOT_POINTS = 1500
+# st.plotly_chart serialises through plotly.io: encode the numpy trace arrays in C via orjson
+pio.json.config.default_engine = 'orjson'
 
 # ==============================================================================
-# 2. DATA COLLECTOR (FIXED PARSING)
+# 2. DATA COLLECTOR (SEPARATE PROCESS, see collector.py)
 # ==============================================================================
-async def fetch_all_prices(coin="ETH"):
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    prices = {'timestamp': now}
-    
-    # Critical: Use a real browser User-Agent to avoid exchange blocks
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-    }
-    
-    async with aiohttp.ClientSession(headers=headers) as session:
-        # 1. BINANCE FUTURES (fapi.binance.com)
-        try:
-            url = f"https://fapi.binance.com/fapi/v1/ticker/price?symbol={coin}USDT"
-            async with session.get(url, timeout=5) as r:
-                if r.status == 200:
-                    d = await r.json()
-                    prices['binance'] = float(d['price'])
-                    API_LOG['Binance'] = "🟢"
-                else: API_LOG['Binance'] = f"🔴 {r.status}"
-        except: API_LOG['Binance'] = "❌ Err"
-
-        # 2. BYBIT V5 (api.bybit.com)
-        try:
-            url = f"https://api.bybit.com/v5/market/tickers?category=linear&symbol={coin}USDT"
-            async with session.get(url, timeout=5) as r:
-                if r.status == 200:
-                    d = await r.json()
-                    prices['bybit'] = float(d['result']['list'][0]['lastPrice'])
-                    API_LOG['Bybit'] = "🟢"
-                else: API_LOG['Bybit'] = f"🔴 {r.status}"
-        except: API_LOG['Bybit'] = "❌ Err"
-
-        # 3. ZKLIGHTER (Nested List Parsing Fix)
-        try:
-            m_id = 4 if coin == "BTC" else 2048
-            url = f"https://mainnet.zklighter.elliot.ai/api/v1/orderBookOrders?market_id={m_id}&limit=1"
-            async with session.get(url, timeout=5) as r:
-                if r.status == 200:
-                    d = await r.json()
-                    # Lighter returns [[price, size], ...]
-                    if d.get('asks') and d.get('bids'):
-                        ask = float(d['asks'][0][0])
-                        bid = float(d['bids'][0][0])
-                        prices['lighter'] = (ask + bid) / 2
-                        API_LOG['Lighter'] = "🟢"
-                    else: API_LOG['Lighter'] = "🟡 No Liquidity"
-                else: API_LOG['Lighter'] = f"🔴 {r.status}"
-        except: API_LOG['Lighter'] = "❌ Err"
-
-        # 4. PARADEX (The fallback that worked)
-        try:
-            url = f"https://api.prod.paradex.trade/v1/markets/summary?market={coin}-USD-PERP"
-            async with session.get(url, timeout=5) as r:
-                if r.status == 200:
-                    d = await r.json()
-                    prices['paradex'] = float(d['results'][0]['last_traded_price'])
-                    API_LOG['Paradex'] = "🟢"
-        except: API_LOG['Paradex'] = "❌ Err"
-
-    return prices
-
-class MasterCollector(threading.Thread):
-    def __init__(self):
-        super().__init__(daemon=True)
-        self.coins = ["ETH", "BTC"]
-        
-    def run(self):
-        loop = asyncio.new_event_loop()
-        while True:
-            for coin in self.coins:
-                try:
-                    p = loop.run_until_complete(fetch_all_prices(coin))
-                    path = os.path.join(DATA_DIR, f"db_{coin}.csv")
-                    if not os.path.exists(path):
-                        with open(path, 'w', newline='') as f:
-                            csv.writer(f).writerow(['timestamp','lighter','paradex','bybit','binance'])
-                    if len(p) > 1:
-                        with open(path, 'a', newline='') as f:
-                            csv.writer(f).writerow([p['timestamp'], p.get('lighter',''), p.get('paradex',''), p.get('bybit',''), p.get('binance','')])
-                except: pass
-            time.sleep(2)
-
 @st.cache_resource
 def start_worker():
-    w = MasterCollector(); w.start(); return w
+    # cache_resource keeps reruns and sessions from spawning more collectors; the collector's own
+    # lockfile turns away any extra one (cache clear, a second server, a standalone run).
+    # Spawned rather than forked: the child starts clean instead of copying Streamlit's threads.
+    # Old-format history is moved aside here too, before the first chart read can hit it.
+    collector.retire_legacy_history()
+    w = mp.get_context('spawn').Process(target=collector.main, name="collector", daemon=True)
+    w.start(); return w
 
 # ==============================================================================
 # 3. FRAGMENT (ANIMATED FEEL, NO-BLINK)
 # ==============================================================================
-@st.fragment(run_every=2.0)
-def render_plots(coin, bench, hist, roll, s90, s50, s10):
-    path = os.path.join(DATA_DIR, f"db_{coin}.csv")
-    if not os.path.exists(path):
-        st.info("⌛ Gathering data...")
-        return
+def get_figures():
+    """Build the plot figures once per session; fragment runs only swap trace data."""
+    if 'figs' not in st.session_state:
+        f1 = go.Figure()
+        f1.add_trace(go.Scatter(line=dict(color='#00FFAA')))
+        f1.add_trace(go.Scatter(name="Lighter", line=dict(color='#FF00FF')))
+        f1.update_layout(title="Live Price Feed", height=300, template="plotly_dark", margin=dict(t=30,b=10))
 
-    df = pd.read_csv(path)
-    if df.empty: return
+        f2 = go.Figure(go.Scatter(name="Spread", line=dict(color='#FF4B4B')))
+        f2.update_layout(title="Spread (bps)", height=300, template="plotly_dark")
 
-    # Cleaning
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df = df.set_index('timestamp').sort_index() # FIXED: Removed inplace=True
-    df = df[~df.index.duplicated(keep='last')]
-    
-    # Better gap handling for new datasets
-    for c in ['lighter','paradex','bybit','binance']:
-        df[c] = pd.to_numeric(df[c], errors='coerce').ffill().bfill()
+        f3 = go.Figure(go.Bar(marker_color='#FF4B4B', opacity=0.7))
+        f3.update_layout(title="Spread Distribution", height=250, template="plotly_dark", bargap=0.05)
+
+        f4 = go.Figure()
+        f4.add_trace(go.Scatter(name="90th", line=dict(color='#FF4B4B', dash='dot')))
+        f4.add_trace(go.Scatter(name="Median", line=dict(color='#00D4FF')))
+        f4.add_trace(go.Scatter(name="10th", line=dict(color='#FFD700', dash='dot')))
+        f4.update_layout(title="Market Corridor", height=250, template="plotly_dark")
 
-    # Calculations
+        f5 = go.Figure(go.Bar(marker_color='#00D4FF', opacity=0.7))
+        f5.update_layout(height=250, template="plotly_dark", bargap=0.05)
+
+        st.session_state.figs = {'p1': f1, 'p2': f2, 'p3': f3, 'p4': f4, 'p5': f5}
+    return st.session_state.figs
+
+def read_history(src, cols, header=True):
+    """Parse history rows from a path or buffer, pruned to `cols` (header=False for an appended tail)."""
+    # Typed read: prices come back as float32 directly, no per-column coercion
+    # (half the memory/bandwidth of float64; ~0.001 bps resolution on the spread).
+    # Full loads go through pyarrow's multi-threaded CSV reader; tails are a few
+    # rows, where the C engine's lower setup cost wins.
+    kw = dict(engine='pyarrow') if header else dict(header=None, names=['timestamp'] + PRICE_COLS)
+    df = pd.read_csv(src, usecols=['timestamp'] + cols,
+                     dtype={'timestamp': 'int64', **{c: PRICE_DTYPE for c in cols}}, na_values=[''], **kw)
+    # int64 epoch-ns reinterpreted as datetime64[ns] (zero-copy)
+    df.index = pd.DatetimeIndex(df.pop('timestamp').to_numpy().view('datetime64[ns]'))
+    return df
+
+def clean_history(df):
+    # The collector appends strictly increasing timestamps; sort/dedup only if that ever breaks
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index() # FIXED: Removed inplace=True
+    if not df.index.is_unique:
+        df = df[~df.index.duplicated(keep='last')]
+    return df
+
+def load_history(path, cols):
+    """
+    Cleaned history for one coin file and column set. The parsed frame is kept in
+    session state with the byte offset it was read up to, so each call seeks past
+    the rows already parsed and only reads what was appended since.
+    """
+    cache = st.session_state.setdefault('history', {})
+    key = (path, *cols)
+    df, offset, ino = cache.get(key, (None, 0, None))
+
+    with open(path, 'rb') as f:
+        # First load, or the collector rotated the file (os.replace gives it a new inode,
+        # and it may already have grown back past the cached offset): parse it in full
+        st_ino = os.fstat(f.fileno()).st_ino
+        if df is None or st_ino != ino or f.seek(0, os.SEEK_END) < offset:
+            df, offset = None, 0
+        f.seek(offset)
+        data = f.read()
+    # Complete rows only; a row still being written is picked up on the next call
+    data = data[:data.rfind(b'\n') + 1]
+
+    if df is None:
+        df = read_history(io.BytesIO(data), cols)
+        # The collector forward-fills as it writes; this once-per-load pass only covers
+        # the start of a fresh file and rows written before it did
+        df[cols] = df[cols].ffill().bfill()
+        df = clean_history(df)
+    elif data:
+        tail = read_history(io.BytesIO(data), cols, header=False)
+        ordered = tail.index.is_monotonic_increasing and (df.empty or tail.index[0] > df.index[-1])
+        df = pd.concat([df, tail])
+        if not ordered:
+            df = clean_history(df)
+
+    cache[key] = (df, offset + len(data), st_ino)
+    return df
+
+def spread_stats(key, df, target, roll):
+    """
+    Spread and its q10/q50/q90 for every history row, as a (4, len(df)) array.
+    Results are kept in session state; only rows appended since the last call
+    (plus the window of samples before them) are computed.
+    """
+    cache = st.session_state.setdefault('spread_stats', {})
+    ts = df.index.asi8
+    window = roll * 60 * 10**9
+    buf, n, last = cache.get(key, (np.empty((4, 0), PRICE_DTYPE), 0, None))
+    # Reloaded or reordered history (rotation, out-of-order rows): start over
+    if n == 0 or n > len(ts) or ts[n - 1] != last:
+        n = 0
+    if n < len(ts):
+        # Appended in place into a buffer with doubling capacity, so a rerun
+        # allocates only when it outgrows it (rows before n are never rewritten)
+        if len(ts) > buf.shape[1]:
+            grown = np.empty((4, max(len(ts), 2 * buf.shape[1])), PRICE_DTYPE)
+            grown[:, :n] = buf[:, :n]
+            buf = grown
+        start = np.searchsorted(ts, ts[n] - window, side='right') if n else 0
+        # Spread and all three corridor quantiles in one compiled pass (see kernels.py)
+        new = spread_corridor(df[target].to_numpy()[start:], df['lighter'].to_numpy()[start:], ts[start:], window)
+        buf[:, n:len(ts)] = new[:, n - start:]
+        n = len(ts)
+    cache[key] = (buf, n, ts[-1])
+    return buf[:, :n]
+
+def update_figures(path, bench, hist, roll, s90, s50, s10):
+    """Recompute the view from the history file and swap it into the cached figures."""
+    # Only the two plotted venues are parsed
     target = bench.lower()
-    df['spread'] = (df[target] - df['lighter']) / df[target] * 10000
-    
-    view = df[df.index >= (df.index[-1] - timedelta(minutes=hist))].copy()
-    if view.empty: return
+    cols = ['lighter', target]
+    df = load_history(path, cols)
+    if df.empty: return False
 
-    view['q90'] = view['spread'].rolling(f"{roll}min").quantile(0.90)
-    view['q50'] = view['spread'].rolling(f"{roll}min").quantile(0.50)
-    view['q10'] = view['spread'].rolling(f"{roll}min").quantile(0.10)
+    # Read-only window slice: binary search on the sorted int64 index, positional (no-copy) slice;
+    # derived series stay plain ndarrays
+    ts = df.index.asi8
+    start = np.searchsorted(ts, ts[-1] - hist * 60 * 10**9, side='left')
+    view = df.iloc[start:]
 
-    # UI Settings
-    cfg = {'displayModeBar': False}
+    # Calculations (spread is only evaluated for new rows, then served from the cache)
+    t = view[target].to_numpy()
+    spread, q10, q50, q90 = spread_stats((path, target, roll), df, target, roll)[:, start:]
+
+    figs = get_figures()
+
+    # Line traces get at most ~PLOT_POINTS samples (strided, newest point always kept);
+    # histograms below still bin the full-resolution arrays
+    step = max(1, len(view) // PLOT_POINTS)
+    ds = slice((len(view) - 1) % step, None, step)
+
+    # Trace data is swapped in place; batch_update applies each figure's edits at once
+    # Stamps are UTC epoch-ns; the axis shows local wall time
+    x = view.index[ds].tz_localize('UTC').tz_convert(LOCAL_TZ).tz_localize(None)
+    f1, f2, f3, f4, f5 = (figs[k] for k in ('p1', 'p2', 'p3', 'p4', 'p5'))
 
     # Plot 1: Prices
-    f1 = go.Figure()
-    f1.add_trace(go.Scatter(x=view.index, y=view[target], name=bench, line=dict(color='#00FFAA')))
-    f1.add_trace(go.Scatter(x=view.index, y=view['lighter'], name="Lighter", line=dict(color='#FF00FF')))
-    f1.update_layout(title="Live Price Feed", height=300, template="plotly_dark", margin=dict(t=30,b=10))
-    st.plotly_chart(f1, use_container_width=True, config=cfg, key="p1")
+    with f1.batch_update():
+        f1.data[0].update(x=x, y=t[ds], name=bench)
+        f1.data[1].update(x=x, y=view['lighter'].to_numpy()[ds])
 
     # Plot 2: Spread Line
-    f2 = go.Figure(go.Scatter(x=view.index, y=view['spread'], name="Spread", line=dict(color='#FF4B4B')))
-    f2.update_layout(title="Spread (bps)", height=300, template="plotly_dark")
-    st.plotly_chart(f2, use_container_width=True, config=cfg, key="p2")
-
-    # Plot 3: Histogram
-    f3 = go.Figure(go.Histogram(x=view['spread'].dropna(), nbinsx=60, marker_color='#FF4B4B', opacity=0.7))
-    f3.update_layout(title="Spread Distribution", height=250, template="plotly_dark", bargap=0.05)
-    st.plotly_chart(f3, use_container_width=True, config=cfg, key="p3")
-
-    # Plot 4: Corridor
-    f4 = go.Figure()
-    if s90: f4.add_trace(go.Scatter(x=view.index, y=view['q90'], name="90th", line=dict(color='#FF4B4B', dash='dot')))
-    if s50: f4.add_trace(go.Scatter(x=view.index, y=view['q50'], name="Median", line=dict(color='#00D4FF')))
-    if s10: f4.add_trace(go.Scatter(x=view.index, y=view['q10'], name="10th", line=dict(color='#FFD700', dash='dot')))
-    f4.update_layout(title="Market Corridor", height=250, template="plotly_dark")
-    st.plotly_chart(f4, use_container_width=True, config=cfg, key="p4")
+    with f2.batch_update():
+        f2.data[0].update(x=x, y=spread[ds])
+
+    # Plot 3: Histogram (binned here, so only NBINS bars are shipped to the browser)
+    counts, edges = histogram(spread, NBINS)
+    with f3.batch_update():
+        f3.data[0].update(x=(edges[:-1] + edges[1:]) / 2, y=counts)
+
+    # Plot 4: Corridor (toggles only flip trace visibility)
+    with f4.batch_update():
+        f4.data[0].update(x=x, y=q90[ds], visible=s90)
+        f4.data[1].update(x=x, y=q50[ds], visible=s50)
+        f4.data[2].update(x=x, y=q10[ds], visible=s10)
 
     # Plot 5: Median Histogram (NEW)
-    f5 = go.Figure(go.Histogram(x=view['q50'].dropna(), nbinsx=60, marker_color='#00D4FF', opacity=0.7))
-    f5.update_layout(title=f"Median ({roll}m) Distribution", height=250, template="plotly_dark", bargap=0.05)
-    st.plotly_chart(f5, use_container_width=True, config=cfg, key="p5")
+    counts, edges = histogram(q50, NBINS)
+    with f5.batch_update():
+        f5.data[0].update(x=(edges[:-1] + edges[1:]) / 2, y=counts)
+        f5.layout.title.text = f"Median ({roll}m) Distribution"
+    return True
+
+@st.fragment(run_every=2.0)
+def render_api_health():
+    # Own fragment: the status lights refresh on the poll cadence without a full rerun
+    status = read_api_status()
+    c1, c2 = st.columns(2)
+    c1.write(f"LGT: {status['Lighter']}")
+    c2.write(f"PDX: {status['Paradex']}")
+    c3, c4 = st.columns(2)
+    c3.write(f"BYB: {status['Bybit']}")
+    c4.write(f"BIN: {status['Binance']}")
+
+@st.fragment(run_every=2.0)
+def render_plots(coin, bench, hist, roll, s90, s50, s10):
+    path = os.path.join(DATA_DIR, f"db_{coin}.csv")
+    if not os.path.exists(path):
+        st.info("⌛ Gathering data...")
+        return
+
+    # Nothing new on disk and same settings: redraw the last figures without recomputing
+    sig = (os.path.getmtime(path), coin, bench, hist, roll, s90, s50, s10)
+    if sig != st.session_state.get('last_sig'):
+        if not update_figures(path, bench, hist, roll, s90, s50, s10): return
+        st.session_state.last_sig = sig
+
+    # UI Settings
+    cfg = {'displayModeBar': False}
+    for key, fig in get_figures().items():
+        st.plotly_chart(fig, use_container_width=True, config=cfg, key=key)
 
 # ==============================================================================
 # 4. MAIN TERMINAL
@@ -184,18 +250,14 @@ def main():
     
     # API Monitor in Sidebar
     st.sidebar.markdown("### API Health")
-    c1, c2 = st.sidebar.columns(2)
-    c1.write(f"LGT: {API_LOG['Lighter']}")
-    c2.write(f"PDX: {API_LOG['Paradex']}")
-    c3, c4 = st.sidebar.columns(2)
-    c3.write(f"BYB: {API_LOG['Bybit']}")
-    c4.write(f"BIN: {API_LOG['Binance']}")
+    with st.sidebar:
+        render_api_health()
 
     coin = st.sidebar.selectbox("Asset", ["ETH", "BTC"])
     bench = st.sidebar.selectbox("Benchmark", ["Paradex", "Bybit", "Binance"])
     
     st.sidebar.divider()
-    hist = st.sidebar.slider("Lookback (Mins)", 5, 1440, 60)
+    hist = st.sidebar.slider("Lookback (Mins)", 5, MAX_LOOKBACK_MINS, 60)
     roll = st.sidebar.slider("Stats Window (Mins)", 1, 120, 30)
     
     s90 = st.sidebar.checkbox("Show 90th", True)
@@ -0,0 +1,395 @@
+"""
+Price collector: polls the four venues for each coin every POLL_SECONDS and appends
+the rows to data/db_{coin}.csv. Runs in its own process (started by the dashboard, or
+standalone with `python collector.py`) so polling never shares a GIL with rendering.
+"""
+import aiohttp
+import orjson
+import yarl
+import asyncio
+import logging
+import random
+import signal
+import sys
+import threading
+import time
+import os
+import atexit
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    # libuv-backed loop for the collector; not available on Windows
+    import uvloop
+except ImportError:
+    uvloop = None
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+# ==============================================================================
+# 1. ROBUST SETUP & PATHING
+# ==============================================================================
+DATA_DIR = "data"
+os.makedirs(DATA_DIR, exist_ok=True)
+
+COINS = ["ETH", "BTC"]
+PRICE_COLS = ['lighter', 'paradex', 'bybit', 'binance']
+PRICE_DECIMALS = 4
+
+# History is bounded to what the dashboard can display: max lookback at the poll cadence
+POLL_SECONDS = 2
+MAX_LOOKBACK_MINS = 1440
+MAX_ROWS = MAX_LOOKBACK_MINS * 60 // POLL_SECONDS
+
+# Rows are buffered and appended in batches of FLUSH_ROWS, or after FLUSH_SECONDS if polls
+# are failing; the dashboard lags by up to FLUSH_ROWS * POLL_SECONDS
+FLUSH_ROWS = 10
+FLUSH_SECONDS = 30
+
+# Per-venue status, published to STATUS_PATH for the dashboard whenever it changes
+API_LOG = {"Lighter": "⏳", "Paradex": "⏳", "Bybit": "⏳", "Binance": "⏳"}
+STATUS_PATH = os.path.join(DATA_DIR, "api_status.json")
+# Held by the running collector: a second one (cache clear, another server, a standalone run) exits
+LOCK_PATH = os.path.join(DATA_DIR, "collector.lock")
+
+logger = logging.getLogger(__name__)
+
+# Expected per-request failures (network, timeout, non-JSON body, unexpected payload shape):
+# they only flip the venue's light, and a LOG_SAMPLE fraction of them is logged
+FETCH_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError, IndexError, TypeError)
+LOG_SAMPLE = 0.01
+
+# ==============================================================================
+# 2. DATA COLLECTOR (FIXED PARSING)
+# ==============================================================================
+# Critical: Use a real browser User-Agent to avoid exchange blocks
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+}
+
+async def make_session():
+    """One keep-alive session for the collector's lifetime (created on the collector's loop)."""
+    return aiohttp.ClientSession(
+        headers=HEADERS,
+        connector=aiohttp.TCPConnector(limit=20, limit_per_host=4, keepalive_timeout=75, ttl_dns_cache=300),
+        # Public market-data endpoints only: no cookies to store or send back
+        cookie_jar=aiohttp.DummyCookieJar(),
+        timeout=aiohttp.ClientTimeout(total=5),
+    )
+
+def _fetch_failed(venue, err):
+    API_LOG[venue] = "❌ Err"
+    if random.random() < LOG_SAMPLE:
+        logger.warning("%s fetch failed: %r", venue, err)
+
+async def read_json(r):
+    # orjson straight off the body bytes: skips aiohttp's stdlib json and content-type check
+    return orjson.loads(await r.read())
+
+def venue_urls(coin):
+    """Request URL per venue for one coin, built and parsed once, then reused by every poll."""
+    m_id = 4 if coin == "BTC" else 2048
+    urls = {
+        'binance': f"https://fapi.binance.com/fapi/v1/ticker/price?symbol={coin}USDT",
+        'bybit': f"https://api.bybit.com/v5/market/tickers?category=linear&symbol={coin}USDT",
+        'lighter': f"https://mainnet.zklighter.elliot.ai/api/v1/orderBookOrders?market_id={m_id}&limit=1",
+        'paradex': f"https://api.prod.paradex.trade/v1/markets/summary?market={coin}-USD-PERP",
+    }
+    # Pre-parsed URL objects: aiohttp skips re-parsing the string on each request
+    return {venue: yarl.URL(url, encoded=True) for venue, url in urls.items()}
+
+async def _fetch_binance(session, url):
+    # 1. BINANCE FUTURES (fapi.binance.com)
+    try:
+        async with session.get(url) as r:
+            if r.status == 200:
+                d = await read_json(r)
+                API_LOG['Binance'] = "🟢"
+                return float(d['price'])
+            else: API_LOG['Binance'] = f"🔴 {r.status}"
+    except FETCH_ERRORS as e: _fetch_failed('Binance', e)
+
+async def _fetch_bybit(session, url):
+    # 2. BYBIT V5 (api.bybit.com)
+    try:
+        async with session.get(url) as r:
+            if r.status == 200:
+                d = await read_json(r)
+                API_LOG['Bybit'] = "🟢"
+                return float(d['result']['list'][0]['lastPrice'])
+            else: API_LOG['Bybit'] = f"🔴 {r.status}"
+    except FETCH_ERRORS as e: _fetch_failed('Bybit', e)
+
+# Lighter levels come as [price, size] lists or {'price': ...} objects depending on the
+# API version; the shape is probed on the first response and its parser reused after that
+_lighter_price = None
+
+def _level_parser(level):
+    return (lambda x: float(x[0])) if isinstance(level, list) else (lambda x: float(x['price']))
+
+async def _fetch_lighter(session, url):
+    # 3. ZKLIGHTER (Nested List Parsing Fix)
+    global _lighter_price
+    try:
+        async with session.get(url) as r:
+            if r.status == 200:
+                d = await read_json(r)
+                if d.get('asks') and d.get('bids'):
+                    if _lighter_price is None:
+                        _lighter_price = _level_parser(d['asks'][0])
+                    ask = _lighter_price(d['asks'][0])
+                    bid = _lighter_price(d['bids'][0])
+                    API_LOG['Lighter'] = "🟢"
+                    return (ask + bid) / 2
+                else: API_LOG['Lighter'] = "🟡 No Liquidity"
+            else: API_LOG['Lighter'] = f"🔴 {r.status}"
+    except FETCH_ERRORS as e: _fetch_failed('Lighter', e)
+
+async def _fetch_paradex(session, url):
+    # 4. PARADEX (The fallback that worked)
+    try:
+        async with session.get(url) as r:
+            if r.status == 200:
+                d = await read_json(r)
+                API_LOG['Paradex'] = "🟢"
+                return float(d['results'][0]['last_traded_price'])
+    except FETCH_ERRORS as e: _fetch_failed('Paradex', e)
+
+VENUE_FETCHERS = {
+    'binance': _fetch_binance,
+    'bybit': _fetch_bybit,
+    'lighter': _fetch_lighter,
+    'paradex': _fetch_paradex,
+}
+
+async def fetch_all_prices(session, urls):
+    # Epoch nanoseconds (UTC): written as a plain int64, no string parsing on read
+    prices = {'timestamp': time.time_ns()}
+
+    # The venues are independent hosts: wall time is the slowest request, not the sum
+    results = await asyncio.gather(*(f(session, urls[v]) for v, f in VENUE_FETCHERS.items()), return_exceptions=True)
+    for venue, value in zip(VENUE_FETCHERS, results):
+        if isinstance(value, float):
+            prices[venue] = value
+        elif isinstance(value, Exception):
+            # Not an expected fetch failure: a bug, so always log it
+            logger.error("%s fetcher crashed", venue, exc_info=value)
+
+    return prices
+
+def format_row(p):
+    """One encoded CSV line: int timestamp, fixed-precision prices (shorter than float repr), blanks for misses."""
+    return (f"{p['timestamp']}," + ','.join(f"{p[c]:.{PRICE_DECIMALS}f}" if c in p else '' for c in PRICE_COLS) + '\n').encode()
+
+def write_rows(fd, rows):
+    """Append encoded rows with one vectored write (os.writev; a joined os.write where it is missing, e.g. Windows)."""
+    if hasattr(os, 'writev'):
+        n = os.writev(fd, rows)
+        data = b''.join(rows)[n:] if n < sum(map(len, rows)) else b''
+    else:
+        data = b''.join(rows)
+    # Short writes (disk nearly full) must not leave half a row behind
+    while data:
+        data = data[os.write(fd, data):]
+
+def retire_legacy_history():
+    """
+    Move aside history files in the old format (local-time string timestamps), which the
+    int64 reader can't parse; they are kept as db_{coin}.legacy.csv and a fresh file starts.
+    """
+    for coin in COINS:
+        path = os.path.join(DATA_DIR, f"db_{coin}.csv")
+        try:
+            with open(path, 'rb') as f:
+                f.readline()
+                row = f.readline()
+        except FileNotFoundError:
+            continue
+        if row and not row.split(b',', 1)[0].isdigit():
+            os.replace(path, os.path.join(DATA_DIR, f"db_{coin}.legacy.csv"))
+            logger.warning("%s is in the old timestamp format; moved aside", path)
+
+class MasterCollector:
+    def __init__(self):
+        self.coins = COINS
+        retire_legacy_history()
+        self.urls = {c: venue_urls(c) for c in self.coins}
+        self.last_ts = {c: 0 for c in self.coins}
+        self.rows = {c: self._count_rows(self._path(c)) for c in self.coins}
+        # Last price per venue: rows are forward-filled at write time, so readers never have to
+        self.last_prices = {c: self._last_prices(self._path(c)) for c in self.coins}
+        # Raw append descriptors stay open for the collector's lifetime; encoded rows are buffered per coin
+        self.fds = {}
+        self.buffers = {c: [] for c in self.coins}
+        self.flushed_at = {c: time.monotonic() for c in self.coins}
+        # Clear whatever a previous run left behind until the first poll reports
+        self.status = {}
+        self._status_lock = threading.Lock()
+        self._write_status(dict(API_LOG))
+        # Disk writes run here, never on the event loop thread
+        self._pool = ThreadPoolExecutor(max_workers=len(self.coins), thread_name_prefix="csv-writer")
+        for c in self.coins:
+            self._open(c)
+        atexit.register(self.close)
+
+    @staticmethod
+    def _path(coin):
+        return os.path.join(DATA_DIR, f"db_{coin}.csv")
+
+    @staticmethod
+    def _count_rows(path):
+        if not os.path.exists(path):
+            return 0
+        with open(path, 'rb') as f:
+            return max(sum(1 for _ in f) - 1, 0)
+
+    @staticmethod
+    def _last_prices(path):
+        # Seeded from the file's last row so the fill carries across restarts
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'rb') as f:
+            last = deque(f, maxlen=1)
+        fields = last[0].decode().rstrip('\r\n').split(',') if last else []
+        if len(fields) != len(PRICE_COLS) + 1 or not fields[0].isdigit():
+            return {}
+        return {c: float(v) for c, v in zip(PRICE_COLS, fields[1:]) if v}
+
+    def _open(self, coin):
+        # Unbuffered O_APPEND descriptor: each flush is a single syscall straight from the row buffers
+        fd = os.open(self._path(coin), os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+        self.fds[coin] = fd
+        if os.fstat(fd).st_size == 0:
+            write_rows(fd, [(','.join(['timestamp'] + PRICE_COLS) + '\n').encode()])
+
+    def close(self):
+        # Idempotent: also runs from atexit after an explicit close
+        for coin in list(self.fds):
+            self._flush(coin)
+            os.close(self.fds.pop(coin))
+
+    def _rotate(self, coin):
+        """Trim the history file to its newest MAX_ROWS rows (rewrite + atomic replace)."""
+        path = self._path(coin)
+        os.close(self.fds[coin])
+        try:
+            with open(path, newline='') as f:
+                header = f.readline()
+                tail = deque(f, maxlen=MAX_ROWS)
+            with open(path + '.tmp', 'w', newline='') as f:
+                f.write(header)
+                f.writelines(tail)
+            os.replace(path + '.tmp', path)
+            self.rows[coin] = len(tail)
+        finally:
+            self._open(coin)
+
+    def _write_row(self, coin, p):
+        # Keep timestamps strictly increasing so the reader can skip sort/dedup
+        p['timestamp'] = max(p['timestamp'], self.last_ts[coin] + 1)
+        self.last_ts[coin] = p['timestamp']
+        # A venue that missed this tick repeats its last price
+        last = self.last_prices[coin]
+        last.update(p)
+        self.buffers[coin].append(format_row(last))
+        if len(self.buffers[coin]) >= FLUSH_ROWS or time.monotonic() - self.flushed_at[coin] >= FLUSH_SECONDS:
+            self._flush(coin)
+
+    def _flush(self, coin):
+        buf = self.buffers[coin]
+        self.flushed_at[coin] = time.monotonic()
+        if not buf:
+            return
+        write_rows(self.fds[coin], buf)
+        self.rows[coin] += len(buf)
+        buf.clear()
+        # Rotate with 25% slack so the rewrite cost is amortised
+        if self.rows[coin] > MAX_ROWS * 5 // 4:
+            self._rotate(coin)
+
+    def _write_status(self, status):
+        # Atomic replace, so the dashboard never reads a half-written file
+        # (the lock serialises the two coins' writer threads on the shared temp file)
+        with self._status_lock:
+            try:
+                with open(STATUS_PATH + '.tmp', 'wb') as f:
+                    f.write(orjson.dumps(status))
+                os.replace(STATUS_PATH + '.tmp', STATUS_PATH)
+                self.status = status
+            except OSError: pass
+
+    def run(self):
+        loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(self._main())
+
+    async def _main(self):
+        session = await make_session()
+        try:
+            # Each coin polls on its own task, so both fetch in parallel every tick
+            await asyncio.gather(*(self._poll(session, c) for c in self.coins))
+        finally:
+            await session.close()
+
+    async def _poll(self, session, coin):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while True:
+            try:
+                p = await fetch_all_prices(session, self.urls[coin])
+                if len(p) > 1:
+                    await loop.run_in_executor(self._pool, self._write_row, coin, p)
+                elif self.buffers[coin] and time.monotonic() - self.flushed_at[coin] >= FLUSH_SECONDS:
+                    # Every venue failed: no row to trigger the flush, so the time bound is checked here
+                    await loop.run_in_executor(self._pool, self._flush, coin)
+                if API_LOG != self.status:
+                    await loop.run_in_executor(self._pool, self._write_status, dict(API_LOG))
+            except Exception:
+                # Keep polling, but never silently (e.g. disk full, rotation failure)
+                logger.exception("%s poll failed", coin)
+            # Fixed-rate schedule: the next tick is POLL_SECONDS after the last one, not after the work
+            # (an overrun restarts the grid rather than bursting to catch up)
+            deadline = max(deadline + POLL_SECONDS, loop.time())
+            await asyncio.sleep(deadline - loop.time())
+
+def read_api_status():
+    """Latest venue status published by the collector process (placeholders until it has polled)."""
+    try:
+        with open(STATUS_PATH, 'rb') as f:
+            return {**API_LOG, **orjson.loads(f.read())}
+    except (OSError, orjson.JSONDecodeError):
+        return API_LOG
+
+def acquire_lock():
+    """
+    Non-blocking exclusive lock on LOCK_PATH, held for the process lifetime. The OS drops it
+    when the process exits, so a crashed collector never leaves a stale lock behind.
+    Returns the open lock file, or None if another collector holds it.
+    """
+    fh = open(LOCK_PATH, 'a+b')
+    try:
+        if os.name == 'nt':
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        fh.close()
+        return None
+    return fh
+
+def main():
+    # Two collectors would append every row twice and rotate each other's files away
+    lock = acquire_lock()
+    if lock is None:
+        logger.warning("Another collector holds %s; exiting", LOCK_PATH)
+        return
+    # Turn a terminate() from the dashboard into a normal exit, so atexit flushes the buffered rows
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    MasterCollector().run()
+
+if __name__ == "__main__":
+    main()
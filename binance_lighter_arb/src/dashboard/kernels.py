@@ -0,0 +1,138 @@
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # No JIT available: the decorators become no-ops and the NumPy versions
+    # at the bottom of the module replace the loop kernels
+    def njit(*args, **kwargs):
+        return lambda f: f
+    HAVE_NUMBA = False
+else:
+    HAVE_NUMBA = True
+
+# Corridor quantiles, in the order the kernels return them
+QUANTILES = (0.10, 0.50, 0.90)
+
+# Compiled once and cached on disk (__pycache__), so only the first session pays the JIT.
+# The kernels are NaN-aware, so fastmath (which assumes no NaNs) stays off.
+
+@njit(cache=True, boundscheck=False)
+def _quantile_sorted(win, m, q):
+    """Linear-interpolated quantile of the first m (sorted) values, same as pandas."""
+    pos = q * (m - 1)
+    lo = int(pos)
+    if lo + 1 < m:
+        return win[lo] + (win[lo + 1] - win[lo]) * (pos - lo)
+    return win[lo]
+
+@njit(cache=True, nogil=True, boundscheck=False)
+def rolling_quantiles(values, ts, window):
+    """
+    q10/q50/q90 over a trailing time window (ts - window, ts], NaNs skipped.
+    Matches pandas' Series.rolling(f"{m}min").quantile(q) for each q in QUANTILES.
+
+    The window is kept as a sorted buffer: each step inserts the new sample and
+    evicts expired ones by binary search + shift, instead of re-sorting the window.
+    """
+    n = values.shape[0]
+    out = np.full((3, n), np.nan, values.dtype)
+    win = np.empty(n, values.dtype)
+    m = 0
+    lo = 0
+    for i in range(n):
+        v = values[i]
+        if not np.isnan(v):
+            k = np.searchsorted(win[:m], v)
+            for j in range(m, k, -1):
+                win[j] = win[j - 1]
+            win[k] = v
+            m += 1
+        while ts[lo] <= ts[i] - window:
+            old = values[lo]
+            if not np.isnan(old):
+                k = np.searchsorted(win[:m], old)
+                for j in range(k, m - 1):
+                    win[j] = win[j + 1]
+                m -= 1
+            lo += 1
+        if m == 0:
+            continue
+        for k in range(3):
+            out[k, i] = _quantile_sorted(win, m, QUANTILES[k])
+    return out[0], out[1], out[2]
+
+# error_model='numpy': a zero price gives inf/NaN like the NumPy fallback, not ZeroDivisionError
+@njit(cache=True, nogil=True, boundscheck=False, error_model='numpy')
+def spread_corridor(target, lighter, ts, window):
+    """
+    Spread in bps, (target - lighter) / target * 10000, and its rolling q10/q50/q90,
+    in one compiled pass over the raw price arrays. Returns a (4, n) array.
+    """
+    n = target.shape[0]
+    out = np.empty((4, n), target.dtype)
+    for i in range(n):
+        out[0, i] = (target[i] - lighter[i]) / target[i] * 10000
+    q10, q50, q90 = rolling_quantiles(out[0], ts, window)
+    out[1] = q10
+    out[2] = q50
+    out[3] = q90
+    return out
+
+@njit(cache=True, boundscheck=False)
+def histogram(values, nbins):
+    """Single-pass equal-width histogram over the finite values. Returns (counts, edges)."""
+    lo = np.inf
+    hi = -np.inf
+    for v in values:
+        if np.isfinite(v):
+            lo = min(lo, v)
+            hi = max(hi, v)
+    counts = np.zeros(nbins, np.int64)
+    if lo > hi:
+        return counts, np.zeros(nbins + 1)
+    step = (hi - lo) / nbins if hi > lo else 1.0
+    for v in values:
+        if np.isfinite(v):
+            k = min(int((v - lo) / step), nbins - 1)
+            counts[k] += 1
+    return counts, lo + step * np.arange(nbins + 1)
+
+def _rolling_quantiles_np(values, ts, window):
+    """NumPy fallback for rolling_quantiles: one np.partition per step serves all three quantiles."""
+    n = values.shape[0]
+    out = np.full((3, n), np.nan, values.dtype)
+    starts = np.searchsorted(ts, ts - window, side='right')
+    qs = np.array(QUANTILES)
+    for i in range(n):
+        win = values[starts[i]:i + 1]
+        win = win[~np.isnan(win)]
+        m = win.shape[0]
+        if m == 0:
+            continue
+        pos = qs * (m - 1)
+        lo = pos.astype(np.int64)
+        hi = np.minimum(lo + 1, m - 1)
+        part = np.partition(win, np.union1d(lo, hi))
+        out[:, i] = part[lo] + (part[hi] - part[lo]) * (pos - lo)
+    return out[0], out[1], out[2]
+
+def _spread_corridor_np(target, lighter, ts, window):
+    out = np.empty((4, target.shape[0]), target.dtype)
+    np.subtract(target, lighter, out=out[0])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(out[0], target, out=out[0])
+    out[0] *= 10000
+    out[1:] = _rolling_quantiles_np(out[0], ts, window)
+    return out
+
+def _histogram_np(values, nbins):
+    finite = values[np.isfinite(values)]
+    if finite.size == 0:
+        return np.zeros(nbins, np.int64), np.zeros(nbins + 1)
+    return np.histogram(finite, nbins)
+
+if not HAVE_NUMBA:
+    rolling_quantiles = _rolling_quantiles_np
+    spread_corridor = _spread_corridor_np
+    histogram = _histogram_np
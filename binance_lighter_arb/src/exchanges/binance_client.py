@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import aiohttp
 from typing import Dict, Any, Optional, Callable
 from binance import AsyncClient, BinanceSocketManager
 from exchanges.base import ExchangeClient
@@ -16,7 +17,15 @@ class BinanceClientWrapper(ExchangeClient):
         self._execution_callback: Optional[Callable] = None
 
     async def connect(self):
-        self.client = await AsyncClient.create(self.api_key, self.api_secret, testnet=self.testnet)
+        # AsyncClient keeps one aiohttp session for its lifetime; give it a pooled keep-alive
+        # connector with cached DNS (closed with the client on disconnect). The timeout goes in
+        # requests_params: the client sets one on every request, overriding any session default.
+        session_params = {
+            "connector": aiohttp.TCPConnector(limit=64, ttl_dns_cache=300, keepalive_timeout=75),
+        }
+        self.client = await AsyncClient.create(self.api_key, self.api_secret, testnet=self.testnet,
+                                               requests_params={"timeout": aiohttp.ClientTimeout(total=3)},
+                                               session_params=session_params)
         self.bsm = BinanceSocketManager(self.client)
         logger.info(f"Connected to Binance {'Testnet' if self.testnet else 'Mainnet'}")
 
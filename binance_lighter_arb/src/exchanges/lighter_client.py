@@ -1,4 +1,5 @@
 import logging
+import numpy as np
 from typing import Dict, Any, Optional
 from lighter.lighter_client import Client
 from lighter.modules.blockchain import OrderSide
@@ -32,14 +33,21 @@ class LighterClientWrapper(ExchangeClient):
         """Fetch the current orderbook for a given symbol."""
         raw_ob = await self.client.async_api.get_orderbook(symbol)
         
-        # Format for consistency with Binance: {'bids': [[price, qty], ...], 'asks': [[price, qty], ...]}
+        # Same [price, qty] row layout as Binance, as float64 (n, 2) arrays: {'bids': [[price, qty], ...], 'asks': ...}
         # Elliot.ai response has 'price' and 'remaining_base_amount' keys in list items
         formatted_ob = {
-            'bids': [[float(b['price']), float(b.get('remaining_base_amount', 0))] for b in raw_ob.get('bids', [])],
-            'asks': [[float(a['price']), float(a.get('remaining_base_amount', 0))] for a in raw_ob.get('asks', [])]
+            'bids': self._levels(raw_ob.get('bids', [])),
+            'asks': self._levels(raw_ob.get('asks', []))
         }
         return formatted_ob
 
+    @staticmethod
+    def _levels(levels) -> np.ndarray:
+        # One C-level string->float pass per column instead of two float() calls per level
+        prices = np.array([l['price'] for l in levels], dtype=np.float64)
+        qtys = np.array([l.get('remaining_base_amount', 0) for l in levels], dtype=np.float64)
+        return np.stack([prices, qtys], axis=1)
+
     async def create_order(self, symbol: str, side: str, order_type: str, quantity: float, price: Optional[float] = None) -> Dict[str, Any]:
         """
         For Taker orders, we use market orders or aggressive limit orders.